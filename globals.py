@@ -3,6 +3,8 @@ SCRIPTS_PATH = "./benchmarks/"
 OUPUT_IMAGES_PATH = "./benchmarks/"
 EXECUTION_OUTPUTS_PATH = "./benchmarks/"
 EXECUTION_ERRORS_PATH = "./benchmarks/"
+EXECUTION_TIMEOUT = 300
+EXECUTION_OUTPUT_LIMIT = 1_000_000
 SHEETS = ['Benchmarks']
 WORKBOOK_PATH = './Bulba Coding - ICE Correctness Rating Benchmarks 02_09_2023.xlsx'
 ID_COLUMN = 'ID'
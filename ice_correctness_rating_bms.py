@@ -1,32 +1,87 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
+from python_calamine import CalamineWorkbook
 
 from utils.utils import get_code, update_dataset_local_path, replace_show_with_savefig, save_script, execute_code
 from globals import SHEETS, WORKBOOK_PATH, ID_COLUMN, CODE_COLUMN, FILENAME_COLUMN
 
+COLUMNS = [ID_COLUMN, CODE_COLUMN, FILENAME_COLUMN]
+
+def _cell_value(value):
+    """
+    Normalize a cell value read by calamine, which returns every number as a float.
+
+    Args:
+        value: The cell value.
+
+    Returns:
+        The value, with integral floats converted to int as pandas' Excel reader does (e.g. an ID of 1 stays '1').
+    """
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _execute_script(job):
+    """
+    Save a single script, then execute it and save its output and errors, used as the thread pool worker.
+
+    Args:
+        job (tuple): The script ID and its code.
+
+    Returns:
+        str: The captured output or error message.
+    """
+    id, code = job
+    save_script(code, id)
+    return execute_code(code, save_output=True, id=id)
+
+
 def extract_and_save_scripts_from_sheets():
     """
     Process multiple sheets in an Excel workbook, extract code and save scripts.
 
     This function reads data from specified sheets, extracts code and dataset names,
-    and saves Python scripts based on the extracted information.
+    and saves Python scripts based on the extracted information. The scripts are saved and
+    executed in parallel, one script interpreter per CPU.
     """
+    # Scripts to save and execute by ID; a later row with the same ID replaces an earlier one
+    jobs = {}
+
+    # Open the workbook once for all sheets; calamine parses the XLSX natively and keeps empty cells as ''.
+    # The file handle is released as soon as the workbook has been loaded.
+    with open(WORKBOOK_PATH, 'rb') as workbook_file:
+        workbook = CalamineWorkbook.from_filelike(workbook_file)
+
     for sheet_name in SHEETS:
-        sheet = pd.read_excel(WORKBOOK_PATH, sheet_name=sheet_name, keep_default_na=False)
-        print(sheet.head(20))
-        
-        for row_number, id in enumerate(sheet[ID_COLUMN]):
-            row = sheet.iloc[row_number]
-            code_column, dataset_name = row[CODE_COLUMN], row[FILENAME_COLUMN]
-            
+        rows = workbook.get_sheet_by_name(sheet_name).to_python()
+
+        # Keep only the needed columns and store them as strings, skipping type inference on the rest
+        indices = [rows[0].index(column) for column in COLUMNS]
+        sheet = pd.DataFrame(
+            [[_cell_value(row[index]) for index in indices] for row in rows[1:]],
+            columns=COLUMNS,
+            dtype="string",
+        )
+
+        # Iterate plain object arrays to keep pandas indexing out of the row loop
+        ids = sheet[ID_COLUMN].to_numpy()
+        codes = sheet[CODE_COLUMN].to_numpy()
+        dataset_names = sheet[FILENAME_COLUMN].to_numpy()
+        for row_number, (id, code_column, dataset_name) in enumerate(zip(ids, codes, dataset_names)):
             if code_column:
                 code = get_code(code_column)
                 code = update_dataset_local_path(code, dataset_name)
                 code = replace_show_with_savefig(code, id)
-                save_script(code, id)
-                execute_code(code, save_output=True, id=id)
+                jobs[id] = code
             else:
                 print(f"Skipping row {row_number} with no code.")
 
+    # Scripts are independent of each other and execute_code runs each one in its own interpreter,
+    # so threads are enough to keep one script running per CPU
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(_execute_script, jobs.items()))
+
 
 if __name__ == "__main__":
     # Call the main processing function when the script is executed
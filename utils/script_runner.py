@@ -0,0 +1,102 @@
+"""
+Run a single script in a fresh interpreter for utils.utils.execute_code.
+
+Usage: python script_runner.py <id> <output_limit>, with the code to execute on stdin.
+
+The captured output and error description are written to stdout as a final JSON line.
+This module only imports the standard library, so starting an interpreter for it stays cheap.
+"""
+from io import StringIO
+from contextlib import redirect_stdout
+import json
+import sys
+
+
+class _BoundedStringIO(StringIO):
+    """
+    In-memory text buffer that keeps at most `limit` characters, so scripts printing huge volumes cannot exhaust memory.
+
+    Args:
+        limit (int): The maximum number of characters to keep.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.truncated = False
+
+    def write(self, s: str) -> int:
+        room = self.limit - self.tell()
+        if len(s) > room:
+            self.truncated = True
+            super().write(s[:max(room, 0)])
+        else:
+            super().write(s)
+        return len(s)
+
+
+def run_code(code: str, id: str, output_limit: int):
+    """
+    Execute Python code in the current process and capture its output and errors.
+
+    Args:
+        code (str): The Python code to execute.
+        id (str): An identifier used as the filename reported in tracebacks.
+        output_limit (int): The maximum number of output characters to capture.
+
+    Returns:
+        tuple: The captured standard output and the error description (None if no error occurred).
+    """
+    f = _BoundedStringIO(output_limit)
+    error_found = False
+
+    # Redirect standard output to capture it, up to output_limit characters
+    with redirect_stdout(f):
+        try:
+            # Execute the provided Python code as a standalone script
+            exec(compile(code, f"<{id}>" if id else "<string>", 'exec'), {"__name__": "__main__"})
+        except SyntaxError as err:
+            # Handle syntax errors
+            error_class = err.__class__.__name__
+            detail = err.args[0] if err.args else ''
+            line_number = err.lineno
+            error_found = True
+        except Exception as err:
+            # Handle other exceptions
+            error_class = err.__class__.__name__
+            detail = err.args[0] if err.args else ''
+            # The first traceback entry is this function, the next one is the script's top-level frame
+            tb = err.__traceback__
+            line_number = tb.tb_next.tb_lineno if tb.tb_next else tb.tb_lineno
+            error_found = True
+        except SystemExit as err:
+            # exit() or exit(0) just ends the script early; any other exit code or message is a failure
+            if err.code not in (None, 0):
+                error_class = err.__class__.__name__
+                detail = err.code
+                tb = err.__traceback__
+                line_number = tb.tb_next.tb_lineno if tb.tb_next else tb.tb_lineno
+                error_found = True
+
+    output = f.getvalue()
+    if f.truncated:
+        output += f"\n[output truncated after {output_limit} characters]\n"
+
+    error_desc = f"{error_class} at line {line_number}: {detail}" if error_found else None
+    return output, error_desc
+
+
+def main():
+    """
+    Read the code from stdin and the ID and output limit from the command line, execute the code and
+    write the captured output and error description to stdout as a final JSON line.
+    """
+    code = sys.stdin.buffer.read().decode('utf-8')
+    output, error_desc = run_code(code, sys.argv[1], int(sys.argv[2]))
+    sys.__stdout__.write('\n' + json.dumps({'output': output, 'error': error_desc}) + '\n')
+
+
+if __name__ == "__main__":
+    # Running this file puts its directory first on sys.path; drop it so scripts cannot import this project's modules
+    del sys.path[0]
+    main()
@@ -1,12 +1,28 @@
-from io import StringIO
 import pandas as pd
-from contextlib import redirect_stdout, suppress
+import ast
+from contextlib import suppress
+from functools import lru_cache
+import json
+import subprocess
 import sys
-import traceback
 import os
+import re
 
-from globals import DATASETS_PATH, SCRIPTS_PATH, OUPUT_IMAGES_PATH, EXECUTION_OUTPUTS_PATH, EXECUTION_ERRORS_PATH
+from globals import DATASETS_PATH, SCRIPTS_PATH, OUPUT_IMAGES_PATH, EXECUTION_OUTPUTS_PATH, EXECUTION_ERRORS_PATH, EXECUTION_TIMEOUT, EXECUTION_OUTPUT_LIMIT
 
+# Standalone script run by the interpreter executing the code; it only imports the standard library
+_RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'script_runner.py')
+
+# pandas readers whose first argument is the dataset path
+_DATASET_READERS = {'read_csv', 'read_excel', 'read_parquet'}
+
+# Fallback when no string literal looks like the dataset path: a quoted string literal holding a '.csv' path, capturing the quote symbol
+_CSV_PATH_RE = re.compile(r"""(['"])[^'"\n]*\.csv[^'"\n]*\1""")
+
+# Matches the first code block: the lines after an opening ``` line, up to the next line containing ``` (or the end)
+_FENCE_RE = re.compile(r"```[^\n]*\n(.*?)(?:^[^\n]*```|\Z)", re.DOTALL | re.MULTILINE)
+
+@lru_cache(maxsize=2048)
 def get_code(model_a_response: str) -> str:
     """
     Extract code block from a text response.
@@ -25,31 +41,105 @@ def get_code(model_a_response: str) -> str:
         code = get_code(response)
         print(code)  # Output: 'print("Hello, World!")'
     """
-    code = ""
-    is_code = False
-    is_first_line = False
-
-    for line in model_a_response.splitlines():
-        if '```' not in line and not is_code:
-            continue
-        elif '```' in line and not is_code:
-            is_code = True
-            is_first_line = True
-            continue
-        elif '```' in line and is_code:
-            is_code = False
-            break
-        else:
-            code = code + ('' if is_first_line else '\n') + line
-            is_first_line = False
+    # Responses without any fence have no code; skip the regex entirely
+    if '```' not in model_a_response:
+        return ""
+
+    # Normalize line endings, then drop only the newline that ends the last code line
+    model_a_response = model_a_response.replace('\r\n', '\n').replace('\r', '\n')
+    match = _FENCE_RE.search(model_a_response)
+    return match.group(1).removesuffix('\n') if match else ""
 
-    return code
 
+def _dataset_literal_rank(literal: ast.Constant, reader: str, filename: str):
+    """
+    Rank how likely a string literal is to be the path of the dataset named by filename (lower is better).
+
+    Args:
+        literal (ast.Constant): The string literal.
+        reader (str): The name of the pandas reader called with the literal as its path, or None.
+        filename (str): The name of the dataset file.
 
+    Returns:
+        int: 0 for the same file name, 1 for the same extension, 2 for the path of a read_csv call,
+        or None if the literal does not look like the dataset path.
+    """
+    # Compare the last component of the literal, which may be a local path or a URL
+    literal_name = literal.value.replace('\\', '/').split('?', 1)[0].rsplit('/', 1)[-1]
+    extension = os.path.splitext(filename)[1].lower()
+
+    if filename and literal_name == os.path.basename(filename):
+        return 0
+    if extension and os.path.splitext(literal_name)[1].lower() == extension:
+        return 1
+    if reader == 'read_csv':
+        return 2
+    return None
+
+
+def _find_dataset_literal(code: str, filename: str):
+    """
+    Locate the string literal holding the path of the dataset in the code.
+
+    Any string literal naming the same file as filename is preferred, then one with the same extension,
+    then the path passed to a read_csv call. Within a rank, paths passed to a pandas reader (read_csv,
+    read_excel, read_parquet) come first, then the earliest literal. A path held in a variable is
+    therefore found, while unrelated files read by the script are left alone.
+
+    Args:
+        code (str): The code to search.
+        filename (str): The name of the dataset file.
+
+    Returns:
+        tuple: The start and end offsets of the string literal in the code, or None if the code does not
+        parse or no literal looks like the dataset path.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    # Map the path literal of each pandas reader call to the reader's name
+    readers = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and node.args:
+            reader = getattr(node.func, 'attr', None) or getattr(node.func, 'id', None)
+            if reader in _DATASET_READERS:
+                readers.setdefault(node.args[0], reader)
+
+    # Skip the pieces of f-strings, whose reported positions do not cover a standalone literal
+    f_string_parts = {part for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values}
+
+    candidates = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Constant) and isinstance(node.value, str) and node not in f_string_parts
+                and node.lineno == node.end_lineno):
+            rank = _dataset_literal_rank(node, readers.get(node), filename)
+            if rank is not None:
+                candidates.append((rank, node not in readers, node.lineno, node.col_offset, node))
+    if not candidates:
+        return None
+    literal = min(candidates, key=lambda candidate: candidate[:4])[4]
+
+    # Convert the line number and UTF-8 byte columns reported by ast into string offsets
+    line_start = 0
+    for _ in range(literal.lineno - 1):
+        line_start = code.index('\n', line_start) + 1
+    line = code[line_start:].split('\n', 1)[0].encode('utf-8')
+    start = line_start + len(line[:literal.col_offset].decode('utf-8'))
+    end = line_start + len(line[:literal.end_col_offset].decode('utf-8'))
+    return start, end
+
+
+@lru_cache(maxsize=2048)
 def update_dataset_local_path(code: str, filename: str, datasets_path: str = DATASETS_PATH) -> str:
     """
     Update the dataset file path in the given code to use a local file path.
 
+    The string literal holding the dataset path is replaced: one with the same file name as filename, then
+    one with the same extension, then the path passed to read_csv. If there is none, or the code does not
+    parse, the first quoted '.csv' path is replaced instead.
+
     Args:
         code (str): The code containing the dataset file path.
         filename (str): The name of the dataset file.
@@ -61,20 +151,22 @@ def update_dataset_local_path(code: str, filename: str, datasets_path: str = DAT
     # Create the full local path
     path = os.path.join(datasets_path, filename)
 
-    # Iterate through each line in the code
-    for line in code.splitlines():
-        if '.csv' in line:
-            quote_symbol = "'" if "'" in line else '"'
-            start = line.find(quote_symbol)
-            end = line.rfind(quote_symbol)
-            wrong_path = line[start + 1: end]
-            if len(wrong_path) > 0:
-                # Replace the old dataset path with the new local path
-                newline = line.replace(wrong_path, path)
-                code = code.replace(line, newline)
-                break
+    span = _find_dataset_literal(code, filename)
+    if span:
+        # Replace the reader's path literal with a literal of the local path
+        start, end = span
+        new_literal = repr(path)
+    else:
+        # Find the first quoted dataset path, leaving the code untouched if there is none
+        match = _CSV_PATH_RE.search(code)
+        if not match:
+            return code
 
-    return code
+        # Replace it with the full local path, keeping the original quote symbol
+        start, end = match.span()
+        new_literal = f"{match.group(1)}{path}{match.group(1)}"
+
+    return f"{code[:start]}{new_literal}{code[end:]}"
 
 
 def save_script(code: str, id: str, scripts_path: str = SCRIPTS_PATH):
@@ -87,11 +179,11 @@ def save_script(code: str, id: str, scripts_path: str = SCRIPTS_PATH):
         scripts_path (str, optional): The directory path to save the script. Defaults to SCRIPTS_PATH.
     """
     # Create the full script file path
-    script_path = os.path.join(scripts_path, id + '.py')
+    script_path = os.path.join(scripts_path, f"{id}.py")
 
-    # Write the code to the script file
-    with open(script_path, 'w') as f:
-        f.write(code)
+    # Write the UTF-8 encoded code to the script file, skipping the text I/O layer
+    with open(script_path, 'wb') as f:
+        f.write(code.encode('utf-8'))
 
 
 def replace_show_with_savefig(code, id, output_images_path: str = OUPUT_IMAGES_PATH):
@@ -110,18 +202,39 @@ def replace_show_with_savefig(code, id, output_images_path: str = OUPUT_IMAGES_P
         str: Code with '.show()' replaced by '.savefig()'.
     """
     if '.show()' in code:
-        image_path = os.path.join(output_images_path, id + '.png')
-        code = code.replace('.show()', '.savefig("' + image_path + '")')
-        code = code + '\n' + 'plt.close()'
+        image_path = os.path.join(output_images_path, f"{id}.png")
+        code = code.replace('.show()', f'.savefig("{image_path}")')
+        code = f"{code}\nplt.close()"
     return code
 
 
-def execute_code(code: str, save_output: bool = False, id="", execution_outputs_path: str = EXECUTION_OUTPUTS_PATH, execution_errors_path: str = EXECUTION_ERRORS_PATH):
+def _read_child_result(process: subprocess.CompletedProcess):
+    """
+    Read the output and error description reported by a finished script_runner interpreter.
+
+    Args:
+        process (subprocess.CompletedProcess): The finished interpreter process.
+
+    Returns:
+        tuple: The captured standard output and the error description (None if no error occurred).
+    """
+    try:
+        result = json.loads(process.stdout.splitlines()[-1])
+    except (IndexError, ValueError):
+        # The interpreter died before reporting (e.g. a crash in a native extension)
+        stderr = process.stderr.strip()
+        detail = stderr.splitlines()[-1] if stderr else f"exit code {process.returncode}"
+        return "", f"ProcessError: {detail}"
+    return result['output'], result['error']
+
+
+def execute_code(code: str, save_output: bool = False, id="", execution_outputs_path: str = EXECUTION_OUTPUTS_PATH, execution_errors_path: str = EXECUTION_ERRORS_PATH, timeout: int = EXECUTION_TIMEOUT):
     """
     Execute Python code and capture its output and errors.
 
-    This function takes Python code as input, executes it, and captures both the standard output and any errors.
-    It can optionally save the output and errors to files.
+    This function takes Python code as input, executes it in a separate Python interpreter, and captures both
+    the standard output and any errors. Scripts are isolated from the caller and from each other, and a crashing
+    or hanging script cannot take the caller down. It can optionally save the output and errors to files.
 
     Args:
         code (str): The Python code to execute.
@@ -129,57 +242,45 @@ def execute_code(code: str, save_output: bool = False, id="", execution_outputs_
         id (str, optional): An identifier used as part of the output and error filenames. Defaults to an empty string.
         execution_outputs_path (str, optional): The directory path to save the execution outputs. Defaults to EXECUTION_OUTPUTS_PATH.
         execution_errors_path (str, optional): The directory path to save the execution errors. Defaults to EXECUTION_ERRORS_PATH.
+        timeout (int, optional): Seconds after which the execution is stopped. Defaults to EXECUTION_TIMEOUT.
 
     Returns:
         str: The captured output or error message.
     """
-    f = StringIO()
-    error_found = False
-    
     # Prepare file paths for saving output and errors
     if save_output:
-        error_path = os.path.join(execution_errors_path, id + '_error.txt')
-        output_path = os.path.join(execution_outputs_path, id + '_output.txt')
-
-        # Remove existing error and output files if they exist
-        with suppress(FileNotFoundError):
-            os.remove(error_path)
-        with suppress(FileNotFoundError):
-            os.remove(output_path)
-
-    # Redirect standard output to capture it
-    with redirect_stdout(f):
-        try:
-            # Execute the provided Python code
-            exec(code)
-        except SyntaxError as err:
-            # Handle syntax errors
-            error_class = err.__class__.__name__
-            detail = err.args[0]
-            line_number = err.lineno
-            error_found = True
-        except Exception as err:
-            # Handle other exceptions
-            error_class = err.__class__.__name__
-            detail = err.args[0]
-            _, _, tb = sys.exc_info()
-            line_number = traceback.extract_tb(tb)[1][1]
-            error_found = True
-            
-    if error_found:
-        # Prepare error description
-        error_desc = f"{error_class} at line {line_number}: {detail}"
+        error_path = os.path.join(execution_errors_path, f"{id}_error.txt")
+        output_path = os.path.join(execution_outputs_path, f"{id}_output.txt")
+
+    try:
+        # Execute the provided Python code in a fresh interpreter
+        process = subprocess.run(
+            [sys.executable, _RUNNER_PATH, str(id), str(EXECUTION_OUTPUT_LIMIT)],
+            input=code, capture_output=True, encoding='utf-8', errors='replace', timeout=timeout,
+            # Scripts only save figures, so use the non-interactive backend and skip GUI toolkit startup
+            env={**os.environ, 'MPLBACKEND': 'Agg'},
+        )
+        output, error_desc = _read_child_result(process)
+    except subprocess.TimeoutExpired:
+        output, error_desc = "", f"TimeoutExpired: execution exceeded {timeout} seconds"
+
+    if error_desc:
         if save_output:
-            # Save error description to a file
+            # Save error description to a file, truncating any previous one, and drop a stale output file
             with open(error_path, 'w') as f:
-                f.write(error_desc)                
+                f.write(error_desc)
+            with suppress(FileNotFoundError):
+                os.remove(output_path)
         return error_desc
     else:
-        # Capture and process the standard output
-        output = f.getvalue()
-        if save_output and output:
-            # Save the standard output to a file
-            with open(output_path, 'w') as f:
-                f.write(output)
+        if save_output:
+            # Drop a stale error file and save the standard output to a file, truncating any previous one
+            with suppress(FileNotFoundError):
+                os.remove(error_path)
+            if output:
+                with open(output_path, 'w') as f:
+                    f.write(output)
+            else:
+                with suppress(FileNotFoundError):
+                    os.remove(output_path)
         return output
-